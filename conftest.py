@@ -0,0 +1 @@
+# 放在仓库根目录，pytest 会把根目录加入 sys.path，使 tests/ 能直接 import main
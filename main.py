@@ -4,10 +4,15 @@ v2.6.0 - 配置规范化
 """
 
 import asyncio
-import os
-import tempfile
-import httpx
-from typing import Optional, Dict, List, Set
+import heapq
+import io
+import itertools
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import (TYPE_CHECKING, Optional, Dict, List, Tuple, KeysView, Iterator,
+                    Callable, AsyncIterator)
+from collections import Counter
 from dataclasses import dataclass, field
 from enum import Enum
 import time
@@ -18,11 +23,151 @@ from astrbot.api.star import Context, Star, register
 from astrbot.api import logger
 from astrbot.api.event import MessageChain
 
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
+# httpx / python-docx / charset-normalizer 只在处理上传文件时用到，按需导入以加快插件加载
+if TYPE_CHECKING:
+    import httpx
+
+
+# ==================== 常量 ====================
+
+_KEYWORD_DEFAULT = frozenset({"默认", "default"})
+
+_CONFIRM_VIEW = frozenset({"查看完整", "查看", "full", "view", "完整"})
+_CONFIRM_YES = frozenset({"确认", "y", "yes", "ok", "确定"})
+_CONFIRM_NO = frozenset({"取消", "n", "no", "cancel"})
+_CONFIRM_RESTART = frozenset({"重来", "restart", "reset"})
+
+_CHOICE_SUMMARY = frozenset({"总结", "1", "ai", "summary"})
+_CHOICE_TRUNCATE = frozenset({"截断", "2", "cut", "truncate"})
+_CHOICE_KEEP = frozenset({"保留", "3", "keep", "full"})
+
+_DIVIDER = "━━━━━━━━━━━━━━━━\n"
+
+# 角色名与设定的分隔符：全角冒号 / 半角冒号 / 换行，取最先出现者
+_CHAR_DELIM_RE = re.compile(r"[：:\n]")
+
+# 房间 AI 服务 ID 缓存时长（秒）
+_PROVIDER_CACHE_TTL = 60
+
+# 创建流程消息模板
+_ROOM_NAME_TMPL = (
+    "✅ 名称: {name}\n"
+    + _DIVIDER +
+    "⏱️ 请输入回合超时时间（30-600秒）\n"
+    "💡 输入 '默认' = {default_timeout}秒"
+)
+
+_TIMEOUT_TMPL = (
+    "✅ 超时: {timeout}秒\n"
+    + _DIVIDER +
+    "🌍 请输入世界观设定\n"
+    "📝 支持：直接输入 / 上传 .txt / .docx\n"
+    "💡 建议不超过 {max_len} 字"
+)
+
+_WORLD_TOO_LONG_TMPL = (
+    "⚠️ 世界观过长！\n"
+    + _DIVIDER +
+    "📊 当前: {length} 字\n"
+    "📊 建议: ≤ {max_len} 字\n"
+    + _DIVIDER +
+    "请选择处理方式：\n\n"
+    "1️⃣ 输入 '总结' → AI总结为 ~{summary_len}字\n"
+    "2️⃣ 输入 '截断' → 保留前 {max_len}字\n"
+    "3️⃣ 输入 '保留' → 使用全文（可能影响AI效果）\n"
+    "4️⃣ 重新输入更短的世界观"
+)
+
+_CONFIRM_TMPL = (
+    "📋 请确认房间配置\n"
+    + _DIVIDER +
+    "📍 名称: {name}\n"
+    "⏱️ 超时: {timeout}秒\n"
+    "🌍 世界观: {world_len}字{original_info}\n\n"
+    "{preview}\n"
+    + _DIVIDER +
+    "输入: 确认 | 取消 | 重来 | 查看完整"
+)
+
+_START_PROMPT = (
+    "🎮 创建冒险房间\n"
+    + _DIVIDER +
+    "📝 请输入房间名称（1-30字）\n"
+    + _DIVIDER +
+    "💡 /tw cancel 取消创建"
+)
+
+_QUICKSTART_TMPL = (
+    "⚡ 快速创建成功！\n"
+    "📍 {name} | 🆔 {room_id}\n"
+    "加入: /tw join {room_id}\n"
+    "开始: /tw begin"
+)
+
+_ROOM_CREATED_TMPL = (
+    "🎮 房间创建成功！\n"
+    + _DIVIDER +
+    "📍 名称: {name}\n"
+    "🆔 ID: {room_id}\n"
+    "⏱️ 超时: {timeout}秒\n"
+    + _DIVIDER +
+    "📢 邀请: /tw join {room_id}\n"
+    "👉 开始: /tw begin"
+)
+
+
+# 游戏进程消息模板
+_GAME_START_TMPL = (
+    "━━━━ 🎭 {room_name} 开始！ ━━━━\n\n"
+    "{char_intro}\n\n"
+    "【开场】\n{opening}\n\n"
+    + _DIVIDER +
+    "🔄 第1轮 | ⏱️{timeout}秒\n"
+    "使用 /tw act <行动描述> 进行冒险"
+)
+
+_ROUND_RESULT_TMPL = (
+    "━━━━ 📖 第{round}轮结果 ━━━━\n\n"
+    "【玩家行动】\n{actions}\n\n"
+    "【DM回应】\n{dm_response}\n\n"
+    + _DIVIDER +
+    "🔄 第{next_round}轮开始！\n"
+    "⏱️ 超时: {timeout}秒\n"
+    "使用 /tw act <行动> 进行冒险"
+)
+
+_HELP_TEXT = (
+    "🎮 Textworld 文字冒险\n"
+    "━━━━━━━━━━━━━━━━━━━━━━\n"
+    "📌 创建房间\n"
+    "  /tw start - 引导创建\n"
+    "  /tw quickstart - 快速创建\n"
+    "  /tw cancel - 取消创建\n"
+    "━━━━━━━━━━━━━━━━━━━━━━\n"
+    "📌 加入游戏\n"
+    "  /tw join <ID> - 加入房间\n"
+    "  /tw leave - 离开房间\n"
+    "  /tw list - 房间列表\n"
+    "━━━━━━━━━━━━━━━━━━━━━━\n"
+    "🎭 游戏命令\n"
+    "  /tw begin - 开始游戏\n"
+    "  /tw act <行动> - 执行行动\n"
+    "  /tw status - 查看状态\n"
+    "  /tw world - 查看世界观\n"
+    "  /tw chars - 查看角色\n"
+    "━━━━━━━━━━━━━━━━━━━━━━\n"
+    "⚙️ 房主命令\n"
+    "  /tw pause - 暂停\n"
+    "  /tw resume - 恢复\n"
+    "  /tw close - 关闭房间"
+)
+
+
+_ADMIN_HELP_TEXT = (
+    "🔧 管理员命令:\n"
+    "/tw admin close <房间ID> - 强制关闭\n"
+    "/tw admin list - 详细列表"
+)
 
 
 # ==================== 数据模型 ====================
@@ -53,7 +198,30 @@ class CreationStep(Enum):
     CONFIRM = "confirm"
 
 
-@dataclass
+_ROOM_STATUS_LABELS = {
+    RoomStatus.WAITING: "⏳等待中",
+    RoomStatus.CHARACTER_CREATION: "🎭角色创建",
+    RoomStatus.ACTIVE: "🎮游戏中",
+    RoomStatus.PAUSED: "⏸️已暂停",
+}
+
+_ROOM_LIST_ICONS = {
+    RoomStatus.WAITING: "⏳",
+    RoomStatus.CHARACTER_CREATION: "🎭",
+    RoomStatus.ACTIVE: "🎮",
+    RoomStatus.PAUSED: "⏸️",
+}
+
+_PLAYER_STATUS_ICONS = {
+    PlayerStatus.ACTIVE: "⏳",
+    PlayerStatus.ACTED: "✅",
+    PlayerStatus.TIMEOUT: "⏰",
+    PlayerStatus.CREATING_CHAR: "📝",
+    PlayerStatus.CHAR_DONE: "✅",
+}
+
+
+@dataclass(slots=True)
 class PendingCreation:
     player_id: str
     player_name: str
@@ -63,10 +231,9 @@ class PendingCreation:
     timeout: Optional[int] = None
     world_setting: Optional[str] = None
     original_world_setting: Optional[str] = None
-    created_at: float = field(default_factory=time.time)
 
 
-@dataclass
+@dataclass(slots=True)
 class Player:
     player_id: str
     player_name: str
@@ -86,13 +253,13 @@ class Player:
         return self.character_name is not None and self.character_setting is not None
 
 
-@dataclass
+@dataclass(slots=True)
 class PendingConfig:
     timeout: Optional[int] = None
     correction_text: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class GameHistory:
     round_number: int
     player_actions: Dict[str, str]
@@ -100,7 +267,7 @@ class GameHistory:
     timestamp: float = field(default_factory=time.time)
 
 
-@dataclass
+@dataclass(slots=True)
 class Room:
     room_id: str
     room_name: str
@@ -108,6 +275,9 @@ class Room:
     host_umo: str
     world_setting: str
     original_world_setting: Optional[str] = None
+    # 由 world_setting 派生：角色创建阶段的预览 / 开场提示词用的截断版本
+    world_preview: str = field(default="", init=False, repr=False, compare=False)
+    world_prompt: str = field(default="", init=False, repr=False, compare=False)
     
     status: RoomStatus = RoomStatus.WAITING
     paused: bool = False
@@ -126,11 +296,63 @@ class Room:
     
     created_at: float = field(default_factory=time.time)
     
+    # 消息来源引用计数，随玩家增删维护
+    _origin_counts: Counter = field(default_factory=Counter, init=False, repr=False, compare=False)
+    # 活跃玩家按状态计数，供 check_all_* 以 O(1) 判断
+    _status_counts: Counter = field(default_factory=Counter, init=False, repr=False, compare=False)
+    # 本轮已提交的行动：玩家 ID -> (角色名, 行动)
+    _current_actions: Dict[str, Tuple[str, str]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # 房主会话的 AI 服务 ID 缓存
+    _provider_id: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _provider_ts: float = field(default=0.0, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        world = self.world_setting
+        self.world_preview = world if len(world) <= 300 else world[:300] + "..."
+        self.world_prompt = world[:1500]
+        
+        for p in self.iter_all_players():
+            self._origin_counts[p.unified_msg_origin] += 1
+        self._recount_status()
+    
+    def _recount_status(self):
+        self._status_counts = Counter(p.status for p in self.active_players.values())
+    
+    def set_player_status(self, player: Player, status: PlayerStatus):
+        if self.active_players.get(player.player_id) is player:
+            self._status_counts[player.status] -= 1
+            self._status_counts[status] += 1
+        player.status = status
+    
+    def add_player(self, player: Player, pending: bool = False):
+        players = self.pending_players if pending else self.active_players
+        players[player.player_id] = player
+        self._origin_counts[player.unified_msg_origin] += 1
+        if not pending:
+            self._status_counts[player.status] += 1
+    
+    def remove_player(self, player_id: str) -> Optional[Player]:
+        player = self.active_players.pop(player_id, None)
+        if player:
+            self._status_counts[player.status] -= 1
+            self._current_actions.pop(player_id, None)
+        else:
+            player = self.pending_players.pop(player_id, None)
+        if player:
+            origin = player.unified_msg_origin
+            self._origin_counts[origin] -= 1
+            if self._origin_counts[origin] <= 0:
+                del self._origin_counts[origin]
+        return player
+    
+    def iter_all_players(self) -> Iterator[Player]:
+        return itertools.chain(self.active_players.values(), self.pending_players.values())
+    
     def get_all_players(self) -> List[Player]:
-        return list(self.active_players.values()) + list(self.pending_players.values())
+        return list(self.iter_all_players())
     
-    def get_unique_origins(self) -> Set[str]:
-        return {p.unified_msg_origin for p in self.get_all_players()}
+    def get_unique_origins(self) -> KeysView[str]:
+        return self._origin_counts.keys()
     
     def get_active_player_count(self) -> int:
         return len(self.active_players)
@@ -143,6 +365,7 @@ class Room:
             player.status = PlayerStatus.ACTIVE
             self.active_players[player_id] = player
         self.pending_players.clear()
+        self._recount_status()
     
     def apply_pending_config(self):
         if self.pending_config.timeout is not None:
@@ -150,31 +373,43 @@ class Room:
     
     def start_character_creation(self):
         self.status = RoomStatus.CHARACTER_CREATION
-        self.char_creation_start_time = time.time()
+        self.char_creation_start_time = time.monotonic()
         for player in self.active_players.values():
             player.status = PlayerStatus.CREATING_CHAR
+        self._recount_status()
     
     def check_all_characters_done(self) -> bool:
-        return all(p.status == PlayerStatus.CHAR_DONE for p in self.active_players.values())
+        return self._status_counts[PlayerStatus.CHAR_DONE] == len(self.active_players)
     
     def start_new_round(self):
         self.current_round += 1
-        self.round_start_time = time.time()
+        self.round_start_time = time.monotonic()
         for player in self.active_players.values():
             player.reset_for_new_round()
+        self._current_actions = {}
+        self._recount_status()
     
     def check_all_players_acted(self) -> bool:
-        return all(p.status != PlayerStatus.ACTIVE for p in self.active_players.values())
+        return self._status_counts[PlayerStatus.ACTIVE] == 0
     
     def check_all_players_timeout(self) -> bool:
-        return all(p.status == PlayerStatus.TIMEOUT for p in self.active_players.values())
+        return self._status_counts[PlayerStatus.TIMEOUT] == len(self.active_players)
+    
+    def submit_action(self, player: Player, action: str):
+        player.current_action = action
+        self._current_actions[player.player_id] = (player.character_name or player.player_name, action)
+        self.set_player_status(player, PlayerStatus.ACTED)
     
     def get_round_actions(self) -> Dict[str, str]:
-        return {
-            p.character_name or p.player_name: p.current_action 
-            for p in self.active_players.values() 
-            if p.current_action
-        }
+        actions = dict(self._current_actions.values())
+        if len(actions) < len(self._current_actions):
+            # 角色名重复：按玩家顺序重建，与逐个遍历玩家时的覆盖结果一致
+            actions = {
+                p.character_name or p.player_name: p.current_action
+                for p in self.active_players.values()
+                if p.current_action
+            }
+        return actions
     
     def get_characters_info(self) -> str:
         lines = []
@@ -195,11 +430,14 @@ class Room:
         
         if self.history:
             parts.append("\n【历史记录】")
-            for h in self.history[-history_rounds:]:
+            total = len(self.history)
+            for i in range(max(0, total - history_rounds), total):
+                h = self.history[i]
                 parts.append(f"\n第{h.round_number}轮:")
                 for name, action in h.player_actions.items():
                     parts.append(f"  - {name}: {action}")
-                preview = h.dm_response[:100] + "..." if len(h.dm_response) > 100 else h.dm_response
+                dm = h.dm_response
+                preview = dm if len(dm) <= 100 else dm[:100] + "..."
                 parts.append(f"  DM: {preview}")
         
         return "\n".join(parts)
@@ -262,9 +500,9 @@ class RoomManager:
         
         if room.paused:
             player.status = PlayerStatus.PENDING
-            room.pending_players[player_id] = player
+            room.add_player(player, pending=True)
         else:
-            room.active_players[player_id] = player
+            room.add_player(player)
         
         self.player_room_map[player_id] = room_id
         return True, "已加入"
@@ -274,8 +512,7 @@ class RoomManager:
         if not room:
             return False, "不在房间中"
         
-        room.active_players.pop(player_id, None)
-        room.pending_players.pop(player_id, None)
+        room.remove_player(player_id)
         del self.player_room_map[player_id]
         
         if player_id == room.host_id:
@@ -289,7 +526,7 @@ class RoomManager:
             return False
         
         room.status = RoomStatus.CLOSED
-        for player in room.get_all_players():
+        for player in room.iter_all_players():
             self.player_room_map.pop(player.player_id, None)
         del self.rooms[room_id]
         return True
@@ -329,21 +566,96 @@ class RoomManager:
 # ==================== 文件解析器 ====================
 
 class FileParser:
-    SUPPORTED = ['.txt', '.docx']
+    SUPPORTED = frozenset({'.txt', '.docx'})
+    MAX_BYTES = 8 * 1024 * 1024
+    THREAD_THRESHOLD = 512 * 1024  # 超过此大小的文本放到线程中解码
+    
+    _W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+    
+    _client: Optional["httpx.AsyncClient"] = None
     
     @classmethod
-    async def download_file(cls, url: str, timeout: int = 30) -> Optional[bytes]:
+    def get_client(cls) -> "httpx.AsyncClient":
+        """复用同一个连接池，避免每次下载重新握手"""
+        if cls._client is None or cls._client.is_closed:
+            import httpx
+            cls._client = httpx.AsyncClient(
+                timeout=30,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        return cls._client
+    
+    @classmethod
+    async def close_client(cls):
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+    
+    @classmethod
+    async def download_file(cls, url: str, timeout: int = 30) -> tuple[Optional[bytes], Optional[str]]:
+        """返回 (文件内容, 错误信息)，失败时内容为 None"""
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                resp = await client.get(url)
-                return resp.content if resp.status_code == 200 else None
+            client = cls.get_client()
+            async with client.stream("GET", url, timeout=timeout) as resp:
+                if resp.status_code != 200:
+                    return None, "下载失败"
+                
+                length = resp.headers.get("content-length")
+                if length and length.isdigit() and int(length) > cls.MAX_BYTES:
+                    logger.warning(f"文件过大: {length} 字节")
+                    return None, cls._too_large_msg()
+                
+                buf = bytearray()
+                async for chunk in resp.aiter_bytes(64 * 1024):
+                    buf.extend(chunk)
+                    if len(buf) > cls.MAX_BYTES:
+                        logger.warning(f"文件超过 {cls.MAX_BYTES} 字节，已中止下载")
+                        return None, cls._too_large_msg()
+                return bytes(buf), None
         except Exception as e:
             logger.error(f"下载失败: {e}")
-            return None
+            return None, "下载失败"
     
     @classmethod
-    def parse_txt(cls, content: bytes) -> tuple[bool, str]:
-        for enc in ['utf-8', 'gbk', 'gb2312', 'utf-16', 'latin-1']:
+    def _too_large_msg(cls) -> str:
+        return f"文件过大（上限 {cls.MAX_BYTES / (1024 * 1024):g} MB）"
+    
+    @classmethod
+    async def parse_txt(cls, content: bytes) -> tuple[bool, str]:
+        if len(content) > cls.THREAD_THRESHOLD:
+            return await asyncio.to_thread(cls._parse_txt_sync, content)
+        return cls._parse_txt_sync(content)
+    
+    @classmethod
+    def _parse_txt_sync(cls, content: bytes) -> tuple[bool, str]:
+        # 常见情况：UTF-8（含 BOM）一次解码即可
+        try:
+            text = content.decode('utf-8-sig').strip()
+            return (True, text) if text else (False, "文件为空")
+        except UnicodeDecodeError:
+            pass
+        
+        # 其次是国内常见的 GBK 系（gb18030 兼容 gbk/gb2312），严格解码失败才往下走
+        try:
+            text = content.decode('gb18030').strip()
+            return (True, text) if text else (False, "文件为空")
+        except UnicodeDecodeError:
+            pass
+        
+        # 以上都失败时才做编码探测，短文本探测不可靠，不能放在前面
+        try:
+            from charset_normalizer import from_bytes
+        except ImportError:
+            from_bytes = None
+        
+        if from_bytes is not None:
+            best = from_bytes(content).best()
+            if best is not None:
+                text = str(best).strip()
+                if text:
+                    return True, text
+        
+        for enc in ['utf-16', 'latin-1']:
             try:
                 text = content.decode(enc).strip()
                 if text:
@@ -353,39 +665,104 @@ class FileParser:
         return False, "无法识别编码"
     
     @classmethod
-    def parse_docx(cls, content: bytes) -> tuple[bool, str]:
-        if not DOCX_AVAILABLE:
+    def _run_text(cls, run) -> str:
+        """与 python-docx 的 Run.text 保持一致"""
+        w = cls._W_NS
+        pieces = []
+        for node in run:
+            tag = node.tag
+            if tag == w + 't':
+                pieces.append(node.text or '')
+            elif tag in (w + 'tab', w + 'ptab'):
+                pieces.append('\t')
+            elif tag == w + 'cr':
+                pieces.append('\n')
+            elif tag == w + 'br':
+                # 分页 / 分栏符不产生文本
+                if node.get(w + 'type', 'textWrapping') == 'textWrapping':
+                    pieces.append('\n')
+            elif tag == w + 'noBreakHyphen':
+                pieces.append('-')
+        return ''.join(pieces)
+    
+    @classmethod
+    def _iter_docx_paragraphs(cls, xml_file):
+        """流式解析 document.xml，逐段产出正文段落文本
+        
+        与 python-docx 的 doc.paragraphs 一致：只取 w:body 下的段落，表格等嵌套内容不计入
+        """
+        w = cls._W_NS
+        body_tag, p_tag, r_tag, link_tag = w + 'body', w + 'p', w + 'r', w + 'hyperlink'
+        
+        depth = body_depth = 0
+        for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if elem.tag == body_tag:
+                    body_depth = depth
+                continue
+            
+            depth -= 1
+            if not body_depth or depth != body_depth:
+                continue
+            # 正文的直接子元素：段落取文本，其余（表格等）直接丢弃
+            if elem.tag == p_tag:
+                pieces = []
+                for child in elem:
+                    if child.tag == r_tag:
+                        pieces.append(cls._run_text(child))
+                    elif child.tag == link_tag:
+                        pieces.extend(cls._run_text(r) for r in child if r.tag == r_tag)
+                text = ''.join(pieces).strip()
+                if text:
+                    yield text
+            elem.clear()
+    
+    @classmethod
+    async def parse_docx(cls, content: bytes) -> tuple[bool, str]:
+        return await asyncio.to_thread(cls._parse_docx_sync, content)
+    
+    @classmethod
+    def _parse_docx_sync(cls, content: bytes) -> tuple[bool, str]:
+        try:
+            with zipfile.ZipFile(io.BytesIO(content)) as z:
+                if 'word/document.xml' in z.namelist():
+                    with z.open('word/document.xml') as f:
+                        paragraphs = list(cls._iter_docx_paragraphs(f))
+                    return (True, "\n\n".join(paragraphs)) if paragraphs else (False, "文档为空")
+        except zipfile.BadZipFile:
+            return False, "解析失败: 不是有效的 .docx 文件"
+        except Exception as e:
+            return False, f"解析失败: {e}"
+        
+        # 非标准结构，回退到 python-docx
+        try:
+            from docx import Document
+        except ImportError:
             return False, "请安装 python-docx"
         
         try:
-            with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as f:
-                f.write(content)
-                tmp_path = f.name
-            
-            try:
-                doc = Document(tmp_path)
-                paragraphs = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-                return (True, "\n\n".join(paragraphs)) if paragraphs else (False, "文档为空")
-            finally:
-                os.unlink(tmp_path)
+            doc = Document(io.BytesIO(content))
+            paragraphs = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
+            return (True, "\n\n".join(paragraphs)) if paragraphs else (False, "文档为空")
         except Exception as e:
             return False, f"解析失败: {e}"
     
     @classmethod
     async def parse_file(cls, url: str, filename: str) -> tuple[bool, str]:
-        ext = os.path.splitext(filename.lower())[1]
+        dot = filename.rfind('.')
+        ext = filename[dot:].lower() if dot >= 0 else ''
         if ext not in cls.SUPPORTED:
             return False, "不支持的格式"
         
-        content = await cls.download_file(url)
+        content, error = await cls.download_file(url)
+        if error:
+            return False, error
         if not content:
             return False, "下载失败"
         
-        if ext == '.txt':
-            return cls.parse_txt(content)
-        elif ext == '.docx':
-            return cls.parse_docx(content)
-        return False, "未知错误"
+        parsers = {'.txt': cls.parse_txt, '.docx': cls.parse_docx}
+        return await parsers[ext](content)
 
 
 # ==================== 主插件类 ====================
@@ -420,6 +797,9 @@ class TextworldPlugin(Star):
         # 消息配置
         self.chunk_size = config.get("chunk_size", 1000)
         
+        # 文件配置
+        FileParser.MAX_BYTES = config.get("max_file_size_mb", 8) * 1024 * 1024
+        
         # AI配置
         self.opening_max_length = config.get("opening_max_length", 400)
         self.dm_response_max_length = config.get("dm_response_max_length", 500)
@@ -432,6 +812,13 @@ class TextworldPlugin(Star):
         
         # 内部状态
         self.timeout_tasks: Dict[str, asyncio.Task] = {}
+        
+        # 超时调度器
+        self._sched_heap: List[Tuple[float, int, str, str]] = []
+        self._sched_gen: Dict[str, int] = {}
+        self._sched_seq = itertools.count()
+        self._sched_wakeup = asyncio.Event()
+        self._sched_task: Optional[asyncio.Task] = None
         self.pending_creations: Dict[str, PendingCreation] = {}
         
         logger.info(f"Textworld v2.6.0 已加载")
@@ -443,25 +830,36 @@ class TextworldPlugin(Star):
     
     def _split_text(self, text: str) -> List[str]:
         """分割长文本"""
+        if len(text) <= self.chunk_size:
+            return [text]
+        
         chunks: List[str] = []
         paragraphs = text.split('\n')
-        current = ""
+        current_parts: List[str] = []
+        current_len = 0
         
         for para in paragraphs:
-            if len(current) + len(para) + 1 <= self.chunk_size:
-                current += ("\n" if current else "") + para
+            if current_len + len(para) + 1 <= self.chunk_size:
+                if current_len:
+                    current_parts.append(para)
+                    current_len += len(para) + 1
+                else:
+                    current_parts = [para]
+                    current_len = len(para)
             else:
-                if current:
-                    chunks.append(current)
+                if current_len:
+                    chunks.append("\n".join(current_parts))
                 if len(para) > self.chunk_size:
                     for i in range(0, len(para), self.chunk_size):
                         chunks.append(para[i:i+self.chunk_size])
-                    current = ""
+                    current_parts = []
+                    current_len = 0
                 else:
-                    current = para
+                    current_parts = [para]
+                    current_len = len(para)
         
-        if current:
-            chunks.append(current)
+        if current_len:
+            chunks.append("\n".join(current_parts))
         
         return chunks if chunks else [text]
     
@@ -469,17 +867,18 @@ class TextworldPlugin(Star):
         """构建长消息"""
         chunks = self._split_text(text)
         
-        result = ""
+        parts: List[str] = []
         if title:
-            result = f"━━━━ {title} ━━━━\n\n"
+            parts.append(f"━━━━ {title} ━━━━\n\n")
         
-        if len(chunks) == 1:
-            result += chunks[0]
+        n = len(chunks)
+        if n == 1:
+            parts.append(chunks[0])
         else:
             for i, chunk in enumerate(chunks):
-                result += f"[第{i+1}部分/{len(chunks)}]\n{chunk}\n\n"
+                parts.append(f"[第{i+1}部分/{n}]\n{chunk}\n\n")
         
-        return result.strip()
+        return "".join(parts).strip()
     
     def _send_long_message(self, event: AstrMessageEvent, text: str, 
                            title: Optional[str] = None) -> MessageEventResult:
@@ -491,34 +890,39 @@ class TextworldPlugin(Star):
     
     async def _broadcast(self, room: Room, message: str):
         """广播消息（按来源去重）"""
-        unique_origins = room.get_unique_origins()
-        chain = MessageChain().message(message)
-        
-        for origin in unique_origins:
-            try:
-                await self.context.send_message(origin, chain)
-            except Exception as e:
-                logger.error(f"广播失败 {origin}: {e}")
+        unique_origins = list(room.get_unique_origins())
+
+        # 并发发送，每个来源独立构建消息链，避免共享状态
+        results = await asyncio.gather(
+            *(self.context.send_message(origin, MessageChain().message(message))
+              for origin in unique_origins),
+            return_exceptions=True
+        )
+
+        for origin, result in zip(unique_origins, results):
+            if isinstance(result, Exception):
+                logger.error(f"广播失败 {origin}: {result}")
     
     async def _broadcast_long(self, room: Room, text: str, 
                                title: Optional[str] = None,
                                footer: Optional[str] = None):
         """广播长消息"""
-        message = ""
+        parts: List[str] = []
         if title:
-            message = f"━━━━ {title} ━━━━\n\n"
+            parts.append(f"━━━━ {title} ━━━━\n\n")
         
         chunks = self._split_text(text)
-        if len(chunks) == 1:
-            message += chunks[0]
+        n = len(chunks)
+        if n == 1:
+            parts.append(chunks[0])
         else:
             for i, chunk in enumerate(chunks):
-                message += f"[第{i+1}部分/{len(chunks)}]\n{chunk}\n\n"
+                parts.append(f"[第{i+1}部分/{n}]\n{chunk}\n\n")
         
         if footer:
-            message += f"\n━━━━━━━━━━━━━━━━\n{footer}"
+            parts.append(f"\n{_DIVIDER}{footer}")
         
-        await self._broadcast(room, message.strip())
+        await self._broadcast(room, "".join(parts).strip())
     
     # ==================== 文件处理 ====================
     
@@ -581,45 +985,21 @@ class TextworldPlugin(Star):
             return
         
         # 处理房间创建流程
-        if player_id in self.pending_creations:
-            pending = self.pending_creations[player_id]
-            
-            if time.time() - pending.created_at > self.creation_timeout:
-                del self.pending_creations[player_id]
-                yield event.plain_result("⏰ 创建超时")
-                return
-            
-            if pending.step == CreationStep.SUMMARIZING:
-                yield event.plain_result("⏳ AI处理中，请稍候...")
-                return
-            
-            if pending.step == CreationStep.ROOM_NAME:
-                yield self._handle_room_name(event, pending, text)
-            
-            elif pending.step == CreationStep.TIMEOUT:
-                yield self._handle_timeout(event, pending, text)
+        pending = self.pending_creations.get(player_id)
+        if pending:
+            handler = self._CREATION_HANDLERS.get(pending.step)
+            if handler:
+                yield handler(self, event, pending, text)
             
             elif pending.step == CreationStep.WORLD_SETTING:
-                file_info = self._extract_file_from_event(event)
-                if file_info:
-                    yield event.plain_result(f"📄 解析中...")
-                    success, content, _ = await self._handle_file_upload(file_info)
-                    if not success:
-                        yield event.plain_result(f"❌ {content}")
-                        return
-                    yield event.plain_result(f"✅ 解析成功，{len(content)}字")
-                    text = content
-                
-                yield self._handle_world_setting(event, pending, text)
+                async for r in self._handle_world_setting_input(event, pending, text):
+                    yield r
             
             elif pending.step == CreationStep.WORLD_TOO_LONG:
                 results = await self._handle_world_too_long_choice(event, pending, text)
                 for r in results:
                     yield r
             
-            elif pending.step == CreationStep.CONFIRM:
-                yield self._handle_confirm(event, pending, text)
-            
             return
         
         # 处理角色创建
@@ -631,6 +1011,22 @@ class TextworldPlugin(Star):
     
     # ==================== 房间创建流程 ====================
     
+    def _add_pending_creation(self, pending: PendingCreation):
+        self.pending_creations[pending.player_id] = pending
+        self._schedule_pending_expiry(pending)
+    
+    def _pop_pending_creation(self, player_id: str) -> Optional[PendingCreation]:
+        pending = self.pending_creations.pop(player_id, None)
+        if pending:
+            self._cancel_pending_expiry(pending)
+        return pending
+    
+    def _schedule_pending_expiry(self, pending: PendingCreation):
+        self._schedule_timeout("pending", pending.player_id, self.creation_timeout)
+    
+    def _cancel_pending_expiry(self, pending: PendingCreation):
+        self._cancel_scheduled(self._timeout_key("pending", pending.player_id))
+    
     def _handle_room_name(self, event: AstrMessageEvent, pending: PendingCreation, text: str) -> MessageEventResult:
         if len(text) < 1 or len(text) > 30:
             return event.plain_result("❌ 房间名称应为 1-30 字符")
@@ -638,15 +1034,10 @@ class TextworldPlugin(Star):
         pending.room_name = text
         pending.step = CreationStep.TIMEOUT
         
-        return event.plain_result(
-            f"✅ 名称: {text}\n"
-            f"━━━━━━━━━━━━━━━━\n"
-            f"⏱️ 请输入回合超时时间（30-600秒）\n"
-            f"💡 输入 '默认' = {self.default_timeout}秒"
-        )
+        return event.plain_result(_ROOM_NAME_TMPL.format(name=text, default_timeout=self.default_timeout))
     
     def _handle_timeout(self, event: AstrMessageEvent, pending: PendingCreation, text: str) -> MessageEventResult:
-        if text in ["默认", "default"]:
+        if text in _KEYWORD_DEFAULT:
             pending.timeout = self.default_timeout
         else:
             try:
@@ -659,17 +1050,28 @@ class TextworldPlugin(Star):
         
         pending.step = CreationStep.WORLD_SETTING
         
-        return event.plain_result(
-            f"✅ 超时: {pending.timeout}秒\n"
-            f"━━━━━━━━━━━━━━━━\n"
-            f"🌍 请输入世界观设定\n"
-            f"📝 支持：直接输入 / 上传 .txt / .docx\n"
-            f"💡 建议不超过 {self.world_setting_max_length} 字"
-        )
+        return event.plain_result(_TIMEOUT_TMPL.format(
+            timeout=pending.timeout, max_len=self.world_setting_max_length
+        ))
+    
+    async def _handle_world_setting_input(self, event: AstrMessageEvent, pending: PendingCreation,
+                                          text: str) -> AsyncIterator[MessageEventResult]:
+        """处理世界观输入（支持文件上传）"""
+        file_info = self._extract_file_from_event(event)
+        if file_info:
+            yield event.plain_result(f"📄 解析中...")
+            success, content, _ = await self._handle_file_upload(file_info)
+            if not success:
+                yield event.plain_result(f"❌ {content}")
+                return
+            yield event.plain_result(f"✅ 解析成功，{len(content)}字")
+            text = content
+        
+        yield self._handle_world_setting(event, pending, text)
     
     def _handle_world_setting(self, event: AstrMessageEvent, pending: PendingCreation, text: str) -> MessageEventResult:
         """处理世界观输入"""
-        if text in ["默认", "default"] and self.world_template:
+        if text in _KEYWORD_DEFAULT and self.world_template:
             pending.world_setting = self.world_template
             pending.step = CreationStep.CONFIRM
             return self._show_confirm(event, pending)
@@ -681,18 +1083,11 @@ class TextworldPlugin(Star):
             pending.original_world_setting = text
             pending.step = CreationStep.WORLD_TOO_LONG
             
-            return event.plain_result(
-                f"⚠️ 世界观过长！\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"📊 当前: {len(text)} 字\n"
-                f"📊 建议: ≤ {self.world_setting_max_length} 字\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"请选择处理方式：\n\n"
-                f"1️⃣ 输入 '总结' → AI总结为 ~{self.world_setting_summary_length}字\n"
-                f"2️⃣ 输入 '截断' → 保留前 {self.world_setting_max_length}字\n"
-                f"3️⃣ 输入 '保留' → 使用全文（可能影响AI效果）\n"
-                f"4️⃣ 重新输入更短的世界观"
-            )
+            return event.plain_result(_WORLD_TOO_LONG_TMPL.format(
+                length=len(text),
+                max_len=self.world_setting_max_length,
+                summary_len=self.world_setting_summary_length
+            ))
         
         pending.world_setting = text
         pending.step = CreationStep.CONFIRM
@@ -703,15 +1098,19 @@ class TextworldPlugin(Star):
                                              text: str) -> List[MessageEventResult]:
         """处理世界观过长时的用户选择"""
         results: List[MessageEventResult] = []
-        choice = text.lower().strip()
+        choice = text.strip().lower()
         
         original = pending.original_world_setting or ""
         
-        if choice in ["总结", "1", "ai", "summary"]:
+        if choice in _CHOICE_SUMMARY:
             pending.step = CreationStep.SUMMARIZING
             results.append(event.plain_result(f"⏳ AI正在总结 {len(original)} 字..."))
             
+            # AI 总结耗时不计入创建超时
+            self._cancel_pending_expiry(pending)
             success, summary, err = await self._summarize_world_setting(pending.player_umo, original)
+            if self.pending_creations.get(pending.player_id) is pending:
+                self._schedule_pending_expiry(pending)
             
             if success:
                 pending.world_setting = summary
@@ -722,13 +1121,13 @@ class TextworldPlugin(Star):
                 pending.step = CreationStep.WORLD_TOO_LONG
                 results.append(event.plain_result(f"❌ 总结失败: {err}\n请重新选择：总结 / 截断 / 保留"))
         
-        elif choice in ["截断", "2", "cut", "truncate"]:
+        elif choice in _CHOICE_TRUNCATE:
             pending.world_setting = original[:self.world_setting_max_length]
             pending.step = CreationStep.CONFIRM
             results.append(event.plain_result(f"✅ 已截断为前 {self.world_setting_max_length} 字"))
             results.append(self._show_confirm(event, pending))
         
-        elif choice in ["保留", "3", "keep", "full"]:
+        elif choice in _CHOICE_KEEP:
             pending.world_setting = original
             pending.step = CreationStep.CONFIRM
             results.append(event.plain_result(f"✅ 保留全部 {len(original)} 字"))
@@ -765,25 +1164,22 @@ class TextworldPlugin(Star):
         if pending.original_world_setting and len(pending.original_world_setting) != len(world):
             original_info = f"\n📊 原文 {len(pending.original_world_setting)} → 当前 {len(world)} 字"
         
-        return event.plain_result(
-            f"📋 请确认房间配置\n"
-            f"━━━━━━━━━━━━━━━━\n"
-            f"📍 名称: {pending.room_name}\n"
-            f"⏱️ 超时: {pending.timeout}秒\n"
-            f"🌍 世界观: {len(world)}字{original_info}\n\n"
-            f"{preview}\n"
-            f"━━━━━━━━━━━━━━━━\n"
-            f"输入: 确认 | 取消 | 重来 | 查看完整"
-        )
+        return event.plain_result(_CONFIRM_TMPL.format(
+            name=pending.room_name,
+            timeout=pending.timeout,
+            world_len=len(world),
+            original_info=original_info,
+            preview=preview
+        ))
     
     def _handle_confirm(self, event: AstrMessageEvent, pending: PendingCreation, text: str) -> MessageEventResult:
-        t = text.lower().strip()
+        t = text.strip().lower()
         
-        if t in ["查看完整", "查看", "full", "view", "完整"]:
+        if t in _CONFIRM_VIEW:
             world = pending.world_setting or ""
             return self._send_long_message(event, world, title=f"完整世界观 ({len(world)}字)")
         
-        if t in ["确认", "y", "yes", "ok", "确定"]:
+        if t in _CONFIRM_YES:
             room = self.room_manager.create_room(
                 host_id=pending.player_id,
                 host_name=pending.player_name,
@@ -795,57 +1191,56 @@ class TextworldPlugin(Star):
                 original_world_setting=pending.original_world_setting
             )
             
-            del self.pending_creations[pending.player_id]
+            self._pop_pending_creation(pending.player_id)
             
             if not room:
                 return event.plain_result("❌ 创建失败")
             
-            return event.plain_result(
-                f"🎮 房间创建成功！\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"📍 名称: {room.room_name}\n"
-                f"🆔 ID: {room.room_id}\n"
-                f"⏱️ 超时: {room.timeout}秒\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"📢 邀请: /tw join {room.room_id}\n"
-                f"👉 开始: /tw begin"
-            )
+            return event.plain_result(_ROOM_CREATED_TMPL.format(
+                name=room.room_name, room_id=room.room_id, timeout=room.timeout
+            ))
         
-        if t in ["取消", "n", "no", "cancel"]:
-            del self.pending_creations[pending.player_id]
+        if t in _CONFIRM_NO:
+            self._pop_pending_creation(pending.player_id)
             return event.plain_result("❌ 已取消创建")
         
-        if t in ["重来", "restart", "reset"]:
+        if t in _CONFIRM_RESTART:
             pending.step = CreationStep.ROOM_NAME
             pending.room_name = None
             pending.timeout = None
             pending.world_setting = None
             pending.original_world_setting = None
-            pending.created_at = time.time()
+            self._schedule_pending_expiry(pending)
             return event.plain_result("🔄 重新开始\n📝 请输入房间名称（1-30字）:")
         
         return event.plain_result("❓ 请输入: 确认 | 取消 | 重来 | 查看完整")
     
+    def _handle_summarizing(self, event: AstrMessageEvent, pending: PendingCreation, text: str) -> MessageEventResult:
+        return event.plain_result("⏳ AI处理中，请稍候...")
+    
+    # 同步步骤的处理器；WORLD_SETTING / WORLD_TOO_LONG 需要 await，在 on_message 中单独处理
+    _CREATION_HANDLERS: Dict[CreationStep, Callable[..., MessageEventResult]] = {
+        CreationStep.ROOM_NAME: _handle_room_name,
+        CreationStep.TIMEOUT: _handle_timeout,
+        CreationStep.SUMMARIZING: _handle_summarizing,
+        CreationStep.CONFIRM: _handle_confirm,
+    }
+    
     # ==================== 角色创建 ====================
     
     async def _handle_character_input(self, event: AstrMessageEvent, room: Room, 
                                         player: Player, text: str) -> MessageEventResult:
         """处理角色设定"""
-        if "：" in text:
-            parts = text.split("：", 1)
-        elif ":" in text:
-            parts = text.split(":", 1)
-        elif "\n" in text:
-            parts = text.split("\n", 1)
-        else:
+        m = _CHAR_DELIM_RE.search(text)
+        if m is None:
             return event.plain_result(
                 "❌ 格式错误\n"
                 "请使用: 角色名：角色设定\n"
                 "或: 角色名\\n角色设定"
             )
         
-        char_name = parts[0].strip()
-        char_setting = parts[1].strip() if len(parts) > 1 else ""
+        char_name = text[:m.start()].strip()
+        char_setting = text[m.end():].strip()
         
         if len(char_name) < 1 or len(char_name) > 20:
             return event.plain_result("❌ 角色名 1-20 字")
@@ -858,18 +1253,19 @@ class TextworldPlugin(Star):
         
         player.character_name = char_name
         player.character_setting = char_setting
-        player.status = PlayerStatus.CHAR_DONE
+        room.set_player_status(player, PlayerStatus.CHAR_DONE)
         
         await self._broadcast(room, f"✅ {player.player_name} → 【{char_name}】")
         
         if room.check_all_characters_done():
-            await self._stop_timeout(f"char_{room.room_id}")
+            await self._stop_timeout(self._timeout_key("char", room.room_id))
             await self._start_game_after_characters(room)
         
+        preview = char_setting if len(char_setting) <= 80 else f"{char_setting[:80]}..."
         return event.plain_result(
             f"✅ 角色创建完成！\n"
             f"👤 {char_name}\n"
-            f"📝 {char_setting[:80]}{'...' if len(char_setting) > 80 else ''}"
+            f"📝 {preview}"
         )
     
     async def _start_game_after_characters(self, room: Room):
@@ -879,18 +1275,15 @@ class TextworldPlugin(Star):
         
         opening = await self._generate_opening(room)
         
-        char_intro = "【参与角色】\n"
-        for p in room.active_players.values():
-            char_intro += f"• {p.character_name}（{p.player_name}）\n"
+        char_lines = [f"• {p.character_name}（{p.player_name}）" for p in room.active_players.values()]
+        char_intro = "【参与角色】\n" + "\n".join(char_lines)
         
-        message = (
-            f"━━━━ 🎭 {room.room_name} 开始！ ━━━━\n\n"
-            f"{char_intro}\n"
-            f"【开场】\n{opening}\n\n"
-            f"━━━━━━━━━━━━━━━━\n"
-            f"🔄 第1轮 | ⏱️{room.timeout}秒\n"
-            f"使用 /tw act <行动描述> 进行冒险"
-        )
+        message = _GAME_START_TMPL.format_map({
+            "room_name": room.room_name,
+            "char_intro": char_intro,
+            "opening": opening,
+            "timeout": room.timeout,
+        })
         
         await self._broadcast(room, message)
         await self._start_timeout(room)
@@ -918,19 +1311,13 @@ class TextworldPlugin(Star):
             yield event.plain_result("❌ 房间数量已满")
             return
         
-        self.pending_creations[player_id] = PendingCreation(
+        self._add_pending_creation(PendingCreation(
             player_id=player_id,
             player_name=event.get_sender_name(),
             player_umo=event.unified_msg_origin
-        )
+        ))
         
-        yield event.plain_result(
-            f"🎮 创建冒险房间\n"
-            f"━━━━━━━━━━━━━━━━\n"
-            f"📝 请输入房间名称（1-30字）\n"
-            f"━━━━━━━━━━━━━━━━\n"
-            f"💡 /tw cancel 取消创建"
-        )
+        yield event.plain_result(_START_PROMPT)
     
     @tw.command("quickstart")
     async def cmd_quickstart(self, event: AstrMessageEvent, room_name: str = "快速冒险"):
@@ -941,7 +1328,7 @@ class TextworldPlugin(Star):
             yield event.plain_result("❌ 已在房间中")
             return
         
-        self.pending_creations.pop(player_id, None)
+        self._pop_pending_creation(player_id)
         
         world = self.world_template or "这是一个充满奇幻与冒险的世界，魔法与剑术并存，危险与机遇共生。"
         
@@ -956,18 +1343,13 @@ class TextworldPlugin(Star):
         )
         
         if room:
-            yield event.plain_result(
-                f"⚡ 快速创建成功！\n"
-                f"📍 {room.room_name} | 🆔 {room.room_id}\n"
-                f"加入: /tw join {room.room_id}\n"
-                f"开始: /tw begin"
-            )
+            yield event.plain_result(_QUICKSTART_TMPL.format(name=room.room_name, room_id=room.room_id))
         else:
             yield event.plain_result("❌ 创建失败")
     
     @tw.command("cancel")
     async def cmd_cancel(self, event: AstrMessageEvent):
-        if self.pending_creations.pop(event.get_sender_id(), None):
+        if self._pop_pending_creation(event.get_sender_id()):
             yield event.plain_result("✅ 已取消创建")
         else:
             yield event.plain_result("❓ 没有进行中的创建")
@@ -979,17 +1361,18 @@ class TextworldPlugin(Star):
             return
         
         player_id = event.get_sender_id()
-        self.pending_creations.pop(player_id, None)
+        player_name = event.get_sender_name()
+        self._pop_pending_creation(player_id)
         
         success, msg = self.room_manager.join_room(
-            room_id, player_id, event.get_sender_name(),
+            room_id, player_id, player_name,
             event.unified_msg_origin, self.max_players
         )
         
         if success:
             room = self.room_manager.get_room(room_id)
             if room:
-                await self._broadcast(room, f"📢 {event.get_sender_name()} 加入！({room.get_active_player_count()}人)")
+                await self._broadcast(room, f"📢 {player_name} 加入！({room.get_active_player_count()}人)")
             yield event.plain_result(f"✅ {msg}")
         else:
             yield event.plain_result(f"❌ {msg}")
@@ -1015,12 +1398,10 @@ class TextworldPlugin(Star):
         
         room.start_character_creation()
         
-        world_preview = room.world_setting[:300] + "..." if len(room.world_setting) > 300 else room.world_setting
-        
         await self._broadcast(room, 
             f"🎭 {room.room_name} - 角色创建阶段\n"
             f"━━━━━━━━━━━━━━━━\n"
-            f"【世界观预览】\n{world_preview}\n"
+            f"【世界观预览】\n{room.world_preview}\n"
             f"━━━━━━━━━━━━━━━━\n"
             f"⏱️ 请在 {room.char_creation_timeout}秒 内完成\n\n"
             f"📝 格式：角色名：背景、性格、技能\n\n"
@@ -1057,9 +1438,8 @@ class TextworldPlugin(Star):
             yield event.plain_result("❌ 本轮已行动")
             return
         
-        player.current_action = action
-        player.status = PlayerStatus.ACTED
-        player.last_action_time = time.time()
+        room.submit_action(player, action)
+        player.last_action_time = time.monotonic()
         
         char_name = player.character_name or player.player_name
         yield event.plain_result(f"✅ 【{char_name}】行动已记录")
@@ -1069,12 +1449,13 @@ class TextworldPlugin(Star):
     
     @tw.command("pause")
     async def cmd_pause(self, event: AstrMessageEvent):
-        room = self.room_manager.get_room_by_player(event.get_sender_id())
+        player_id = event.get_sender_id()
+        room = self.room_manager.get_room_by_player(player_id)
         if not room:
             yield event.plain_result("❌ 不在房间中")
             return
         
-        success, msg = self.room_manager.pause_room(room.room_id, event.get_sender_id())
+        success, msg = self.room_manager.pause_room(room.room_id, player_id)
         if success:
             await self._stop_timeout(room.room_id)
             await self._broadcast(room, "⏸️ 房间已暂停\n/tw resume 恢复")
@@ -1084,12 +1465,13 @@ class TextworldPlugin(Star):
     
     @tw.command("resume")
     async def cmd_resume(self, event: AstrMessageEvent):
-        room = self.room_manager.get_room_by_player(event.get_sender_id())
+        player_id = event.get_sender_id()
+        room = self.room_manager.get_room_by_player(player_id)
         if not room:
             yield event.plain_result("❌ 不在房间中")
             return
         
-        success, msg = self.room_manager.resume_room(room.room_id, event.get_sender_id())
+        success, msg = self.room_manager.resume_room(room.room_id, player_id)
         if success:
             await self._broadcast(room, f"▶️ 继续第{room.current_round}轮")
             await self._start_timeout(room)
@@ -1105,36 +1487,24 @@ class TextworldPlugin(Star):
             yield event.plain_result("❌ 找不到房间")
             return
         
-        status_map = {
-            RoomStatus.WAITING: "⏳等待中", 
-            RoomStatus.CHARACTER_CREATION: "🎭角色创建",
-            RoomStatus.ACTIVE: "🎮游戏中", 
-            RoomStatus.PAUSED: "⏸️已暂停"
-        }
-        
         host = room.active_players.get(room.host_id)
         
+        player_lines: List[str] = []
+        for p in room.active_players.values():
+            char = f"【{p.character_name}】" if p.character_name else ""
+            player_lines.append(f"  {_PLAYER_STATUS_ICONS.get(p.status, '?')} {p.player_name} {char}\n")
+        
         info = (
             f"📊 {room.room_name}\n"
             f"━━━━━━━━━━━━━━━━\n"
             f"🆔 {room.room_id}\n"
             f"👑 {host.player_name if host else '?'}\n"
-            f"📊 {status_map.get(room.status, '?')}\n"
+            f"📊 {_ROOM_STATUS_LABELS.get(room.status, '?')}\n"
             f"🔄 第{room.current_round}轮 | ⏱️{room.timeout}秒\n"
+            f"👥 玩家({room.get_active_player_count()}):\n"
+            f"{''.join(player_lines)}"
         )
         
-        info += f"👥 玩家({room.get_active_player_count()}):\n"
-        for p in room.active_players.values():
-            char = f"【{p.character_name}】" if p.character_name else ""
-            status_icon = {
-                PlayerStatus.ACTIVE: "⏳",
-                PlayerStatus.ACTED: "✅",
-                PlayerStatus.TIMEOUT: "⏰",
-                PlayerStatus.CREATING_CHAR: "📝",
-                PlayerStatus.CHAR_DONE: "✅"
-            }.get(p.status, "?")
-            info += f"  {status_icon} {p.player_name} {char}\n"
-        
         yield event.plain_result(info)
     
     @tw.command("world")
@@ -1169,29 +1539,33 @@ class TextworldPlugin(Star):
             yield event.plain_result("📭 当前没有房间\n/tw start 创建")
             return
         
-        lines = ["🏠 房间列表", "━━━━━━━━━━━━━━━━"]
-        for r in rooms:
-            status = {"waiting": "⏳", "creating": "🎭", "active": "🎮", "paused": "⏸️"}.get(r.status.value, "?")
-            lines.append(f"{status} {r.room_name}\n   ID: {r.room_id} | 👥{r.get_active_player_count()}")
+        lines = [
+            f"{_ROOM_LIST_ICONS.get(r.status, '?')} {r.room_name}\n   ID: {r.room_id} | 👥{r.get_active_player_count()}"
+            for r in rooms
+        ]
         
-        yield event.plain_result("\n".join(lines))
+        yield event.plain_result("🏠 房间列表\n" + _DIVIDER + "\n".join(lines))
     
     @tw.command("close")
     async def cmd_close(self, event: AstrMessageEvent):
-        room = self.room_manager.get_room_by_player(event.get_sender_id())
+        player_id = event.get_sender_id()
+        room = self.room_manager.get_room_by_player(player_id)
         if not room:
             yield event.plain_result("❌ 不在房间中")
             return
-        if not room.is_host(event.get_sender_id()):
+        if not room.is_host(player_id):
             yield event.plain_result("❌ 只有房主可以关闭")
             return
         
-        name = room.room_name
-        await self._broadcast(room, f"🚫 房间 [{name}] 已关闭")
+        await self._close_room_with_notice(room, f"🚫 房间 [{room.room_name}] 已关闭")
+        yield event.plain_result(f"✅ 已关闭")
+    
+    async def _close_room_with_notice(self, room: Room, notice: str):
+        """通知全员并关闭房间"""
+        await self._broadcast(room, notice)
         await self._stop_timeout(room.room_id)
-        await self._stop_timeout(f"char_{room.room_id}")
+        await self._stop_timeout(self._timeout_key("char", room.room_id))
         self.room_manager.close_room(room.room_id)
-        yield event.plain_result(f"✅ 已关闭")
     
     @tw.command("leave")
     async def cmd_leave(self, event: AstrMessageEvent):
@@ -1223,12 +1597,8 @@ class TextworldPlugin(Star):
                 yield event.plain_result(f"❌ 房间 {target} 不存在")
                 return
             
-            name = room.room_name
-            await self._broadcast(room, f"🚫 房间 [{name}] 被管理员强制关闭")
-            await self._stop_timeout(room.room_id)
-            await self._stop_timeout(f"char_{room.room_id}")
-            self.room_manager.close_room(room.room_id)
-            yield event.plain_result(f"✅ 已强制关闭 [{name}]")
+            await self._close_room_with_notice(room, f"🚫 房间 [{room.room_name}] 被管理员强制关闭")
+            yield event.plain_result(f"✅ 已强制关闭 [{room.room_name}]")
         
         elif action == "list":
             rooms = self.room_manager.get_all_rooms()
@@ -1249,45 +1619,27 @@ class TextworldPlugin(Star):
             yield event.plain_result("\n".join(lines))
         
         else:
-            yield event.plain_result(
-                "🔧 管理员命令:\n"
-                "/tw admin close <房间ID> - 强制关闭\n"
-                "/tw admin list - 详细列表"
-            )
+            yield event.plain_result(_ADMIN_HELP_TEXT)
     
     @tw.command("help")
     async def cmd_help(self, event: AstrMessageEvent):
-        yield event.plain_result(
-            "🎮 Textworld 文字冒险\n"
-            "━━━━━━━━━━━━━━━━━━━━━━\n"
-            "📌 创建房间\n"
-            "  /tw start - 引导创建\n"
-            "  /tw quickstart - 快速创建\n"
-            "  /tw cancel - 取消创建\n"
-            "━━━━━━━━━━━━━━━━━━━━━━\n"
-            "📌 加入游戏\n"
-            "  /tw join <ID> - 加入房间\n"
-            "  /tw leave - 离开房间\n"
-            "  /tw list - 房间列表\n"
-            "━━━━━━━━━━━━━━━━━━━━━━\n"
-            "🎭 游戏命令\n"
-            "  /tw begin - 开始游戏\n"
-            "  /tw act <行动> - 执行行动\n"
-            "  /tw status - 查看状态\n"
-            "  /tw world - 查看世界观\n"
-            "  /tw chars - 查看角色\n"
-            "━━━━━━━━━━━━━━━━━━━━━━\n"
-            "⚙️ 房主命令\n"
-            "  /tw pause - 暂停\n"
-            "  /tw resume - 恢复\n"
-            "  /tw close - 关闭房间"
-        )
+        yield event.plain_result(_HELP_TEXT)
     
     # ==================== AI生成 ====================
     
+    async def _get_room_provider_id(self, room: Room) -> Optional[str]:
+        """获取房间使用的 AI 服务 ID（短时缓存）"""
+        now = time.monotonic()
+        if room._provider_id and now - room._provider_ts < _PROVIDER_CACHE_TTL:
+            return room._provider_id
+        
+        room._provider_id = await self.context.get_current_chat_provider_id(room.host_umo)
+        room._provider_ts = now
+        return room._provider_id
+    
     async def _generate_opening(self, room: Room) -> str:
         try:
-            provider_id = await self.context.get_current_chat_provider_id(room.host_umo)
+            provider_id = await self._get_room_provider_id(room)
             if not provider_id:
                 return "冒险开始了..."
             
@@ -1296,7 +1648,7 @@ class TextworldPlugin(Star):
             prompt = f"""你是文字冒险游戏的DM，叙事风格：{self.dm_style}
 
 【世界观】
-{room.world_setting[:1500]}
+{room.world_prompt}
 
 【参与角色】
 {chars_info}
@@ -1319,7 +1671,7 @@ class TextworldPlugin(Star):
             context = room.build_game_context(self.history_rounds)
             action_text = "\n".join([f"- {name}: {act}" for name, act in actions.items()])
             
-            provider_id = await self.context.get_current_chat_provider_id(room.host_umo)
+            provider_id = await self._get_room_provider_id(room)
             if not provider_id:
                 await self._broadcast(room, "❌ 无法获取AI服务")
                 return
@@ -1341,15 +1693,13 @@ class TextworldPlugin(Star):
             
             action_lines = "\n".join([f"  • {name}: {act}" for name, act in actions.items()])
             
-            message = (
-                f"━━━━ 📖 第{room.current_round}轮结果 ━━━━\n\n"
-                f"【玩家行动】\n{action_lines}\n\n"
-                f"【DM回应】\n{dm_response}\n\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"🔄 第{room.current_round + 1}轮开始！\n"
-                f"⏱️ 超时: {room.timeout}秒\n"
-                f"使用 /tw act <行动> 进行冒险"
-            )
+            message = _ROUND_RESULT_TMPL.format_map({
+                "round": room.current_round,
+                "actions": action_lines,
+                "dm_response": dm_response,
+                "next_round": room.current_round + 1,
+                "timeout": room.timeout,
+            })
             
             await self._broadcast(room, message)
             
@@ -1362,73 +1712,148 @@ class TextworldPlugin(Star):
     
     # ==================== 超时管理 ====================
     
-    async def _start_char_creation_timeout(self, room: Room):
-        task_id = f"char_{room.room_id}"
-        await self._stop_timeout(task_id)
-        
-        async def check():
+    # 回合 / 角色创建 / 房间创建流程的超时共用一个调度任务：
+    # 堆中存放 (deadline, gen, kind, target)，停止超时只需让 gen 失效，过期条目在出堆时跳过
+    # target 为 room_id，pending 类型为 player_id
+    
+    @staticmethod
+    def _timeout_key(kind: str, target: str) -> str:
+        if kind == "round":
+            return target
+        return f"{kind}_{target}"
+    
+    def _schedule_timeout(self, kind: str, target: str, delay: float):
+        key = self._timeout_key(kind, target)
+        gen = next(self._sched_seq)
+        self._sched_gen[key] = gen
+        heapq.heappush(self._sched_heap, (time.monotonic() + delay, gen, kind, target))
+        
+        if self._sched_task is None or self._sched_task.done():
+            self._sched_task = asyncio.create_task(self._scheduler_loop())
+        elif self._sched_heap[0][1] == gen:
+            # 新条目成为最早的截止时间，唤醒调度器重新计算等待时长
+            self._sched_wakeup.set()
+    
+    async def _scheduler_loop(self):
+        heap = self._sched_heap
+        while True:
+            self._sched_wakeup.clear()
+            now = time.monotonic()
+            
+            while heap:
+                deadline, gen, kind, target = heap[0]
+                key = self._timeout_key(kind, target)
+                if self._sched_gen.get(key) != gen:
+                    heapq.heappop(heap)
+                    continue
+                if deadline > now:
+                    break
+                heapq.heappop(heap)
+                del self._sched_gen[key]
+                # 处理过程中可能调用 AI，放到独立任务里，避免阻塞其他房间的超时
+                handler = {
+                    "round": self._on_round_timeout,
+                    "char": self._on_char_timeout,
+                    "pending": self._on_pending_timeout,
+                }[kind]
+                self._spawn_timeout(key, handler(target))
+            
             try:
-                await asyncio.sleep(room.char_creation_timeout)
-                r = self.room_manager.get_room(room.room_id)
-                if not r or r.status != RoomStatus.CHARACTER_CREATION:
-                    return
-                
-                timeout_players = []
-                for p in r.active_players.values():
-                    if p.status == PlayerStatus.CREATING_CHAR:
-                        p.character_name = p.player_name
-                        p.character_setting = "一位神秘的冒险者"
-                        p.status = PlayerStatus.CHAR_DONE
-                        timeout_players.append(p.player_name)
-                
-                if timeout_players:
-                    await self._broadcast(r, f"⏰ 超时: {', '.join(timeout_players)}\n已使用默认角色")
-                
-                await self._start_game_after_characters(r)
-                
-            except asyncio.CancelledError:
+                await asyncio.wait_for(self._sched_wakeup.wait(),
+                                       timeout=heap[0][0] - now if heap else None)
+            except asyncio.TimeoutError:
                 pass
-            except Exception as e:
-                logger.error(f"角色超时失败: {e}")
-        
-        self.timeout_tasks[task_id] = asyncio.create_task(check())
+    
+    async def _start_char_creation_timeout(self, room: Room):
+        await self._stop_timeout(self._timeout_key("char", room.room_id))
+        self._schedule_timeout("char", room.room_id, room.char_creation_timeout)
     
     async def _start_timeout(self, room: Room):
         await self._stop_timeout(room.room_id)
-        room_id = room.room_id
-        
-        async def check():
-            try:
-                await asyncio.sleep(room.timeout)
-                r = self.room_manager.get_room(room_id)
-                if not r or r.paused or r.status != RoomStatus.ACTIVE:
-                    return
-                
-                timeout_players = []
-                for p in r.active_players.values():
-                    if p.status == PlayerStatus.ACTIVE:
-                        p.status = PlayerStatus.TIMEOUT
-                        timeout_players.append(p.character_name or p.player_name)
-                
-                if timeout_players:
-                    await self._broadcast(r, f"⏰ 超时: {', '.join(timeout_players)}")
+        self._schedule_timeout("round", room.room_id, room.timeout)
+    
+    async def _on_pending_timeout(self, player_id: str):
+        pending = self.pending_creations.pop(player_id, None)
+        if not pending:
+            return
+        try:
+            await self.context.send_message(pending.player_umo, MessageChain().message("⏰ 创建超时"))
+        except Exception as e:
+            logger.error(f"创建超时通知失败 {player_id}: {e}")
+    
+    async def _on_char_timeout(self, room_id: str):
+        try:
+            r = self.room_manager.get_room(room_id)
+            if not r or r.status != RoomStatus.CHARACTER_CREATION:
+                return
+            
+            timeout_players = []
+            for p in r.active_players.values():
+                if p.status == PlayerStatus.CREATING_CHAR:
+                    p.character_name = p.player_name
+                    p.character_setting = "一位神秘的冒险者"
+                    r.set_player_status(p, PlayerStatus.CHAR_DONE)
+                    timeout_players.append(p.player_name)
+            
+            if timeout_players:
+                await self._broadcast(r, f"⏰ 超时: {', '.join(timeout_players)}\n已使用默认角色")
+            
+            await self._start_game_after_characters(r)
+            
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"角色超时失败: {e}")
+    
+    async def _on_round_timeout(self, room_id: str):
+        try:
+            r = self.room_manager.get_room(room_id)
+            if not r or r.paused or r.status != RoomStatus.ACTIVE:
+                return
+            
+            timeout_players = []
+            for p in r.active_players.values():
+                if p.status == PlayerStatus.ACTIVE:
+                    r.set_player_status(p, PlayerStatus.TIMEOUT)
+                    timeout_players.append(p.character_name or p.player_name)
+            
+            if timeout_players:
+                await self._broadcast(r, f"⏰ 超时: {', '.join(timeout_players)}")
+            
+            if r.check_all_players_timeout():
+                await self._broadcast(r, "🚫 全员超时，房间关闭")
+                self.room_manager.close_room(room_id)
+            else:
+                await self._process_round(r)
                 
-                if r.check_all_players_timeout():
-                    await self._broadcast(r, "🚫 全员超时，房间关闭")
-                    self.room_manager.close_room(room_id)
-                else:
-                    await self._process_round(r)
-                    
-            except asyncio.CancelledError:
-                pass
-            except Exception as e:
-                logger.error(f"超时失败: {e}")
-        
-        self.timeout_tasks[room_id] = asyncio.create_task(check())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"超时失败: {e}")
+    
+    def _spawn_timeout(self, key: str, coro) -> asyncio.Task:
+        """创建超时处理任务，结束后自动从 timeout_tasks 移除"""
+        task = asyncio.create_task(coro)
+        self.timeout_tasks[key] = task
+        task.add_done_callback(lambda t, k=key: self._discard_timeout(k, t))
+        return task
+    
+    def _discard_timeout(self, key: str, task: asyncio.Task):
+        # 只移除自身，避免误删同名的新任务
+        if self.timeout_tasks.get(key) is task:
+            del self.timeout_tasks[key]
+    
+    def _cancel_scheduled(self, task_id: str):
+        # 尚未触发的超时：作废 gen 即可，无需取消任务
+        self._sched_gen.pop(task_id, None)
     
     async def _stop_timeout(self, task_id: str):
+        self._cancel_scheduled(task_id)
+        
+        # 已触发、正在处理中的超时
         task = self.timeout_tasks.pop(task_id, None)
-        if task and not task.done():
+        # 超时处理内部开启下一轮时会停止自身，此时不能取消/等待自己
+        if task and not task.done() and task is not asyncio.current_task():
             task.cancel()
             try:
                 await task
@@ -1436,7 +1861,18 @@ class TextworldPlugin(Star):
                 pass
     
     async def terminate(self):
+        if self._sched_task and not self._sched_task.done():
+            self._sched_task.cancel()
+            try:
+                await self._sched_task
+            except asyncio.CancelledError:
+                pass
+        self._sched_task = None
+        self._sched_heap.clear()
+        self._sched_gen.clear()
+        
         for task_id in list(self.timeout_tasks.keys()):
             await self._stop_timeout(task_id)
         self.pending_creations.clear()
+        await FileParser.close_client()
         logger.info("Textworld 已卸载")
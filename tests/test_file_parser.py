@@ -0,0 +1,38 @@
+import io
+import zipfile
+
+import pytest
+
+pytest.importorskip("astrbot")
+
+from main import FileParser
+
+
+def test_short_gbk_text_is_not_mojibake():
+    sample = "默认回合超时消息处理"
+    assert FileParser._parse_txt_sync(sample.encode("gbk")) == (True, sample)
+
+
+def test_utf8_bom_text():
+    sample = "世界观设定"
+    assert FileParser._parse_txt_sync(sample.encode("utf-8-sig")) == (True, sample)
+
+
+def _docx(body_xml):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body>{body_xml}</w:body></w:document>",
+        )
+    return buf.getvalue()
+
+
+def test_docx_skips_tables_like_python_docx():
+    content = _docx(
+        "<w:p><w:r><w:t>正文</w:t></w:r></w:p>"
+        "<w:tbl><w:tr><w:tc><w:p><w:r><w:t>表格A</w:t></w:r></w:p></w:tc></w:tr></w:tbl>"
+        "<w:p><w:r><w:t>上</w:t><w:cr/><w:t>下</w:t></w:r></w:p>"
+    )
+    assert FileParser._parse_docx_sync(content) == (True, "正文\n\n上\n下")
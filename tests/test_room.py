@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("astrbot")
+
+from main import Player, Room
+
+
+def _room(*players):
+    room = Room("r1", "房间", "u1", "umo_u1", "世界观")
+    for pid, char_name in players:
+        room.add_player(Player(pid, pid, f"umo_{pid}", character_name=char_name))
+    return room
+
+
+def test_leave_mid_round_keeps_action_of_same_named_player():
+    room = _room(("u1", "勇者"), ("u2", "勇者"), ("u3", "法师"))
+    room.submit_action(room.active_players["u1"], "u1防守")
+    room.submit_action(room.active_players["u2"], "u2进攻")
+    room.remove_player("u2")
+    room.submit_action(room.active_players["u3"], "u3放火")
+    assert room.get_round_actions() == {"勇者": "u1防守", "法师": "u3放火"}
+
+
+def test_same_named_players_follow_player_order():
+    room = _room(("u1", "勇者"), ("u2", "勇者"))
+    room.submit_action(room.active_players["u2"], "u2进攻")
+    room.submit_action(room.active_players["u1"], "u1防守")
+    assert room.get_round_actions() == {"勇者": "u2进攻"}